@@ -0,0 +1,140 @@
+import argparse
+import multiprocessing
+import resource
+import sys
+import time
+from queue import Empty
+
+import numpy as np
+from haystack import Document as HaystackDocument
+
+from core.config import settings
+from core.logger import get_agent_logger, setup_logging
+from database.chroma import ChromaDB
+from pipeline.embedders import create_document_embedder
+
+REFERENCE_BACKEND = "torch"
+
+
+def load_sample_chunks(limit: int) -> list[str]:
+    texts: list[str] = []
+    for collection in ChromaDB().get_collections():
+        if not collection.name.startswith("doc_"):
+            continue
+        batch = (
+            ChromaDB()
+            .get_collection(collection.name)
+            .get(limit=limit - len(texts), include=["documents"])
+        )
+        texts.extend(t for t in batch["documents"] if t)
+        if len(texts) >= limit:
+            break
+    return texts
+
+
+def _run_backend(backend: str, texts: list[str], queue) -> None:
+    try:
+        embedder = create_document_embedder(backend)
+        embedder.warm_up()
+
+        start = time.perf_counter()
+        documents = embedder.run(documents=[HaystackDocument(content=t) for t in texts])
+        elapsed = time.perf_counter() - start
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+        return
+
+    queue.put(
+        {
+            "embeddings": [d.embedding for d in documents["documents"]],
+            "chunks_per_second": len(texts) / elapsed,
+            # ru_maxrss is reported in KiB on Linux
+            "peak_memory_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        }
+    )
+
+
+def run_backend(backend: str, texts: list[str]) -> dict:
+    """Embed texts in a fresh process so memory is measured per backend"""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run_backend, args=(backend, texts, queue))
+    process.start()
+    try:
+        while True:
+            alive = process.is_alive()
+            try:
+                result = queue.get(timeout=1)
+                break
+            except Empty:
+                # the child died without reporting, e.g. killed for memory
+                if not alive:
+                    result = {"error": f"worker exited with code {process.exitcode}"}
+                    break
+    finally:
+        process.join()
+    if "error" in result:
+        raise RuntimeError(f"{backend} backend failed: {result['error']}")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Check embedding parity and throughput against the torch backend"
+    )
+    parser.add_argument("--backend", default=settings.embedding_backend)
+    parser.add_argument("--samples", type=int, default=256)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.99,
+        help="Minimum cosine similarity to the torch embedding for every chunk",
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+    logger = get_agent_logger("benchmark_embeddings")
+
+    texts = load_sample_chunks(args.samples)
+    if not texts:
+        logger.error("No indexed chunks to benchmark, upload a document first")
+        sys.exit(1)
+
+    backends = [REFERENCE_BACKEND]
+    if args.backend != REFERENCE_BACKEND:
+        backends.append(args.backend)
+    try:
+        results = {backend: run_backend(backend, texts) for backend in backends}
+    except RuntimeError as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+    for backend, result in results.items():
+        logger.info(
+            f"{backend}: {result['chunks_per_second']:.1f} chunks/s, "
+            f"peak memory {result['peak_memory_mb']:.0f} MB"
+        )
+
+    if args.backend == REFERENCE_BACKEND:
+        return
+
+    reference = np.asarray(results[REFERENCE_BACKEND]["embeddings"])
+    candidate = np.asarray(results[args.backend]["embeddings"])
+    similarity = np.sum(reference * candidate, axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+    logger.info(
+        f"Cosine similarity over {len(texts)} chunks: "
+        f"min {similarity.min():.4f}, mean {similarity.mean():.4f}"
+    )
+    if similarity.min() < args.tolerance:
+        logger.error(
+            f"{args.backend} embeddings diverge from {REFERENCE_BACKEND} "
+            f"beyond tolerance {args.tolerance}"
+        )
+        sys.exit(1)
+    logger.info(f"{args.backend} embeddings are within tolerance {args.tolerance}")
+
+
+if __name__ == "__main__":
+    main()
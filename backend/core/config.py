@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import Field
 from pydantic_settings import BaseSettings
 
@@ -5,15 +7,32 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     app_name: str = "PDF QA System"
     debug: bool = Field(default=False)
+    gzip_minimum_size: int = Field(default=1000)
 
     upload_dir: str = Field(default="./uploads")
 
     chroma_persist_directory: str = Field(default="./chroma_db")
+    chroma_shard_directories: list[str] = Field(default_factory=list)
+    query_max_workers: int = Field(default=4)
+
+    docling_cache_dir: str = Field(default="./docling_cache")
+
+    checkpoint_dir: str = Field(default="./ingestion_checkpoints")
+    ingestion_batch_size: int = Field(default=64, ge=1)
+    ingestion_max_attempts: int = Field(default=3, ge=1)
+    resume_ingestion_on_startup: bool = Field(default=True)
 
     embedding_model: str = Field(default="sentence-transformers/all-MiniLM-L6-v2")
+    embedding_backend: Literal["torch", "onnx", "openvino"] = Field(default="torch")
+    # local export of embedding_model, e.g. a directory holding onnx/model_qint8.onnx
+    embedding_model_path: str | None = Field(default=None)
+    embedding_model_file: str | None = Field(default=None)
 
     tokenizer_model: str = Field(default="BAAI/bge-small-en-v1.5")
 
+    # documents searched per query when more are selected, 0 searches them all
+    routing_top_m: int = Field(default=5, ge=0)
+
     openai_api_key: str
     openai_model: str = Field(default="gpt-3.5-turbo")
 
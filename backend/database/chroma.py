@@ -1,7 +1,16 @@
+import hashlib
+import os
+
 import chromadb
 from chromadb.config import Settings as ChromaSettings
 
 from core.config import settings
+from core.logger import get_agent_logger
+
+REBALANCE_BATCH_SIZE = 500
+
+# prefix for collections being rebuilt, routed to the same shard as the live one
+STAGING_PREFIX = "staging_"
 
 
 class ChromaDB:
@@ -14,22 +23,119 @@ class ChromaDB:
         return cls._instance
 
     def _initialise(self):
-        self.client = chromadb.PersistentClient(
-            path=settings.chroma_persist_directory,
-            settings=ChromaSettings(),
-        )
+        self.logger = get_agent_logger("ChromaDB")
+        self.shard_paths = settings.chroma_shard_directories or [
+            settings.chroma_persist_directory
+        ]
+        self.clients = [
+            chromadb.PersistentClient(path=path, settings=ChromaSettings())
+            for path in self.shard_paths
+        ]
 
-    def get_collection(self, collection_name: str):
+    def shard_index(self, collection_name: str) -> int:
+        routing_key = collection_name.removeprefix(STAGING_PREFIX)
+        digest = hashlib.sha1(routing_key.encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big") % len(self.clients)
+
+    def shard_path(self, collection_name: str) -> str:
+        return self.shard_paths[self.shard_index(collection_name)]
+
+    def _client_for(self, collection_name: str):
+        return self.clients[self.shard_index(collection_name)]
+
+    def get_collection(self, collection_name: str, metadata: dict | None = None):
+        client = self._client_for(collection_name)
         try:
-            return self.client.get_or_create_collection(name=collection_name)
+            return client.get_or_create_collection(
+                name=collection_name, metadata=metadata
+            )
         except ValueError:
-            return self.client.create_collection(name=collection_name)
+            return client.create_collection(name=collection_name, metadata=metadata)
 
     def get_collections(self):
-        return self.client.list_collections()
+        collections = []
+        for client in self.clients:
+            collections.extend(client.list_collections())
+        return collections
 
     def delete_collection(self, collection_name: str):
         try:
-            self.client.delete_collection(name=collection_name)
+            self._client_for(collection_name).delete_collection(name=collection_name)
         except ValueError:
             pass
+
+    def has_collection(self, collection_name: str) -> bool:
+        client = self._client_for(collection_name)
+        return any(c.name == collection_name for c in client.list_collections())
+
+    def replace_collection(self, staging_name: str, collection_name: str):
+        """Swap a fully built staging collection in for the live one"""
+        if self.has_collection(collection_name):
+            self.delete_collection(collection_name)
+        self._client_for(staging_name).get_collection(name=staging_name).modify(
+            name=collection_name
+        )
+
+    def rebalance(self, source_paths: list[str] | None = None) -> int:
+        """Move every collection to the shard it is routed to, returns moved count
+
+        source_paths are directories outside the current shard list (removed
+        shards, or the old single persist directory) that are drained as well.
+        """
+        sources = list(zip(self.shard_paths, self.clients, strict=True))
+        shard_dirs = {os.path.abspath(path) for path in self.shard_paths}
+        for path in source_paths or []:
+            if os.path.abspath(path) in shard_dirs or not os.path.isdir(path):
+                continue
+            sources.append(
+                (path, chromadb.PersistentClient(path=path, settings=ChromaSettings()))
+            )
+
+        moved = 0
+        for path, client in sources:
+            for collection in client.list_collections():
+                target_index = self.shard_index(collection.name)
+                if self.clients[target_index] is client:
+                    continue
+                self.logger.info(
+                    f"Moving {collection.name} from {path} "
+                    f"to {self.shard_paths[target_index]}"
+                )
+                self._copy_collection(
+                    client.get_collection(name=collection.name),
+                    self.clients[target_index],
+                )
+                client.delete_collection(name=collection.name)
+                moved += 1
+        return moved
+
+    def _copy_collection(self, source, target_client):
+        existing = [
+            c for c in target_client.list_collections() if c.name == source.name
+        ]
+        if existing:
+            if source.count() == 0:
+                # stale empty copy on the old shard, the routed shard already wins
+                return
+            # an empty collection created by a query before rebalancing, or a
+            # partial copy left by an interrupted move
+            target_client.delete_collection(name=source.name)
+        target = target_client.create_collection(
+            name=source.name, metadata=source.metadata
+        )
+        offset = 0
+        while True:
+            batch = source.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=REBALANCE_BATCH_SIZE,
+                offset=offset,
+            )
+            if not batch["ids"]:
+                break
+            target.add(
+                ids=batch["ids"],
+                embeddings=batch["embeddings"],
+                documents=batch["documents"],
+                metadatas=batch["metadatas"],
+            )
+            offset += len(batch["ids"])
@@ -1,19 +1,39 @@
+import threading
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 
 from core.config import settings
 from core.logger import setup_logging
+from pipeline.document_processor import DocumentProcessor
 from routers import document, healthcheck, query
 
 setup_logging()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.resume_ingestion_on_startup:
+        threading.Thread(
+            target=lambda: DocumentProcessor().resume_pending(), daemon=True
+        ).start()
+    yield
+
+
 app = FastAPI(
     title=settings.app_name,
     description="PDF Document QA with RAG using OpenAI",
     version="0.1.0",
     debug=settings.debug,
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
+app.add_middleware(GZipMiddleware, minimum_size=settings.gzip_minimum_size)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -0,0 +1,94 @@
+import gzip
+import hashlib
+import json
+import os
+from importlib.metadata import PackageNotFoundError, version
+
+from docling_core.types.doc import DoclingDocument
+
+from core.config import settings
+from core.logger import get_agent_logger
+
+
+def _converter_version() -> str:
+    try:
+        return version("docling")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+class DoclingCache:
+    """Stores converted DoclingDocuments keyed by file hash and converter version"""
+
+    def __init__(self, cache_dir: str | None = None):
+        self.cache_dir = cache_dir or settings.docling_cache_dir
+        self.documents_dir = os.path.join(self.cache_dir, "documents")
+        self.manifest_dir = os.path.join(self.cache_dir, "manifest")
+        self.converter_version = _converter_version()
+        self.logger = get_agent_logger("DoclingCache")
+        os.makedirs(self.documents_dir, exist_ok=True)
+        os.makedirs(self.manifest_dir, exist_ok=True)
+
+    def key_for(self, file_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return f"{digest.hexdigest()}_{self.converter_version}"
+
+    def _document_path(self, key: str) -> str:
+        return os.path.join(self.documents_dir, f"{key}.json.gz")
+
+    def _manifest_path(self, document_id: str) -> str:
+        return os.path.join(self.manifest_dir, f"{document_id}.json")
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(self._document_path(key))
+
+    def load(self, key: str) -> DoclingDocument | None:
+        path = self._document_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return DoclingDocument.model_validate(json.load(f))
+        except Exception as e:
+            self.logger.warning(f"Discarding unreadable cache entry {key}: {e}")
+            return None
+
+    def save(self, key: str, doc: DoclingDocument) -> None:
+        path = self._document_path(key)
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(doc.export_to_dict(), f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def record(self, document_id: str, key: str, filename: str) -> None:
+        path = self._manifest_path(document_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"document_id": document_id, "cache_key": key, "filename": filename}, f
+            )
+        os.replace(tmp_path, path)
+
+    def get_entry(self, document_id: str) -> dict[str, str] | None:
+        path = self._manifest_path(document_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def remove_entry(self, document_id: str) -> None:
+        path = self._manifest_path(document_id)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def get_entries(self) -> list[dict[str, str]]:
+        entries = []
+        for name in sorted(os.listdir(self.manifest_dir)):
+            if name.endswith(".json"):
+                entry = self.get_entry(name[: -len(".json")])
+                if entry:
+                    entries.append(entry)
+        return entries
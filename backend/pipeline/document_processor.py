@@ -2,137 +2,315 @@ import uuid
 
 from docling.chunking import HybridChunker
 from docling.document_converter import DocumentConverter
+from docling_core.types.doc import DoclingDocument
 from haystack import Document as HaystackDocument
 from haystack import Pipeline, component
-from haystack.components.embedders import SentenceTransformersDocumentEmbedder
 from haystack.components.preprocessors import DocumentCleaner
 from haystack.components.writers import DocumentWriter
 from haystack_integrations.document_stores.chroma import ChromaDocumentStore
 
 from core.config import settings
-from core.logger import get_agent_logger, log_execution
+from core.logger import get_agent_logger, log_exception, log_execution
+from database.chroma import STAGING_PREFIX, ChromaDB
 from document.models import Document
+from pipeline.docling_cache import DoclingCache
+from pipeline.document_router import DocumentRoutingIndex
+from pipeline.embedders import create_document_embedder
+from pipeline.ingestion_checkpoint import IngestionCheckpoint
 
 
 @component
 class DoclingProcessor:
     def __init__(self):
         self.tokenizer_model = settings.tokenizer_model
+        self.converter = DocumentConverter()
+        self.cache = DoclingCache()
         self.logger = get_agent_logger("DoclingProcessor")
 
     @component.output_types(documents=list[HaystackDocument])
-    def run(self, sources: list[str], document_id: str, filename: str):
+    def run(
+        self,
+        document_id: str,
+        filename: str,
+        sources: list[str] | None = None,
+        cache_keys: list[str] | None = None,
+    ):
         documents = []
-        converter = DocumentConverter()
 
-        for source in sources:
+        for source in sources or []:
             try:
-                result = converter.convert(source)
-                doc = result.document
-                chunker = HybridChunker(tokenizer=self.tokenizer_model)
-                chunks_list = list(chunker.chunk(dl_doc=doc))
-                self.logger.info(f"Created {len(chunks_list)} chunks from {filename}")
-
-                for i, chunk in enumerate(chunks_list):
-                    enriched_text = chunker.contextualize(chunk=chunk)
-                    meta = {
-                        "document_id": document_id,
-                        "filename": filename,
-                        "chunk_id": str(uuid.uuid4()),
-                        "chunk_index": i,
-                    }
-                    self.logger.info(
-                        f"Processing chunk {chunk.meta.export_json_dict()}"
-                    )
-                    if hasattr(chunk.meta, "headings") and chunk.meta.headings:
-                        meta["headings"] = ",".join(chunk.meta.headings)
-                    else:
-                        meta["headings"] = ""
-
-                    page_nums = []
-                    if hasattr(chunk.meta, "doc_items"):
-                        for item in chunk.meta.doc_items:
-                            if hasattr(item, "prov") and item.prov:
-                                for prov in item.prov:
-                                    if hasattr(prov, "page_no"):
-                                        page_nums.append(prov.page_no)
-
-                    if page_nums:
-                        unique_pages = list(set(page_nums))
-                        meta["page_nums"] = ",".join(map(str, unique_pages))
-                        meta["first_page"] = min(unique_pages)
-                    else:
-                        meta["page_nums"] = ""
-                        meta["first_page"] = 0
-
-                    if hasattr(chunk.meta, "origin") and hasattr(
-                        chunk.meta.origin, "filename"
-                    ):
-                        meta["original_filename"] = chunk.meta.origin.filename
-
-                    documents.append(
-                        HaystackDocument(content=enriched_text[:500], meta=meta)
-                    )
-
-                self.logger.info(
-                    f"Processed {len(documents)} documents from {filename}"
-                )
+                doc = self._convert(source, document_id, filename)
+                documents.extend(self._chunk(doc, document_id, filename))
             except Exception as e:
                 self.logger.error(f"Error processing {source}: {e}")
-                documents.append(
-                    HaystackDocument(
-                        content=f"Error processing document: {str(e)}",
-                        meta={
-                            "source": source,
-                            "error": str(e),
-                            "document_id": document_id,
-                            "filename": filename,
-                        },
-                    )
-                )
+                documents.append(self._error_document(source, e, document_id, filename))
+
+        # re-indexing replaces a live collection, so a bad cache entry must fail
+        # the run rather than be indexed as an error chunk
+        for key in cache_keys or []:
+            doc = self.cache.load(key)
+            if doc is None:
+                raise ValueError(f"No readable cached conversion for key {key}")
+            documents.extend(self._chunk(doc, document_id, filename))
 
         return {"documents": documents}
 
+    def _convert(self, source: str, document_id: str, filename: str) -> DoclingDocument:
+        key = self.cache.key_for(source)
+        doc = self.cache.load(key)
+        if doc is None:
+            doc = self.converter.convert(source).document
+            self.cache.save(key, doc)
+        else:
+            self.logger.info(f"Using cached conversion for {filename}")
+        self.cache.record(document_id, key, filename)
+        return doc
+
+    def _chunk(
+        self, doc: DoclingDocument, document_id: str, filename: str
+    ) -> list[HaystackDocument]:
+        documents = []
+        chunker = HybridChunker(tokenizer=self.tokenizer_model)
+        chunks_list = list(chunker.chunk(dl_doc=doc))
+        self.logger.info(f"Created {len(chunks_list)} chunks from {filename}")
+
+        for i, chunk in enumerate(chunks_list):
+            enriched_text = chunker.contextualize(chunk=chunk)
+            meta = {
+                "document_id": document_id,
+                "filename": filename,
+                "chunk_id": str(uuid.uuid4()),
+                "chunk_index": i,
+            }
+            self.logger.info(f"Processing chunk {chunk.meta.export_json_dict()}")
+            if hasattr(chunk.meta, "headings") and chunk.meta.headings:
+                meta["headings"] = ",".join(chunk.meta.headings)
+            else:
+                meta["headings"] = ""
+
+            page_nums = []
+            if hasattr(chunk.meta, "doc_items"):
+                for item in chunk.meta.doc_items:
+                    if hasattr(item, "prov") and item.prov:
+                        for prov in item.prov:
+                            if hasattr(prov, "page_no"):
+                                page_nums.append(prov.page_no)
+
+            if page_nums:
+                unique_pages = list(set(page_nums))
+                meta["page_nums"] = ",".join(map(str, unique_pages))
+                meta["first_page"] = min(unique_pages)
+            else:
+                meta["page_nums"] = ""
+                meta["first_page"] = 0
+
+            if hasattr(chunk.meta, "origin") and hasattr(chunk.meta.origin, "filename"):
+                meta["original_filename"] = chunk.meta.origin.filename
+
+            documents.append(HaystackDocument(content=enriched_text[:500], meta=meta))
+
+        self.logger.info(f"Processed {len(documents)} documents from {filename}")
+        return documents
+
+    def _error_document(
+        self, source: str, error: Exception, document_id: str, filename: str
+    ) -> HaystackDocument:
+        return HaystackDocument(
+            content=f"Error processing document: {str(error)}",
+            meta={
+                "source": source,
+                "error": str(error),
+                "document_id": document_id,
+                "filename": filename,
+            },
+        )
+
 
 class DocumentProcessor:
     def __init__(self):
-        self.embedding_model = settings.embedding_model
+        self.batch_size = settings.ingestion_batch_size
         self.logger = get_agent_logger("DocumentProcessor")
 
     @log_execution
     def process_document(self, document: Document, file_path: str) -> int:
-        document_store = ChromaDocumentStore(
+        checkpoint = IngestionCheckpoint.start(
+            document_id=document.id,
+            filename=document.metadata.filename,
             collection_name=document.collection_name,
-            persist_path=settings.chroma_persist_directory,
+            file_path=file_path,
+        )
+        return self._run_checkpoint(checkpoint)
+
+    @log_execution
+    def reindex_document(self, document_id: str) -> int:
+        """Re-chunk and re-embed a document from its cached conversion"""
+        cache = DoclingCache()
+        entry = cache.get_entry(document_id)
+        if not entry or not cache.has(entry["cache_key"]):
+            raise ValueError(f"No cached conversion for document {document_id}")
+
+        # build alongside the live collection so the document stays queryable
+        collection_name = f"doc_{document_id}"
+        if not ChromaDB().has_collection(collection_name):
+            raise ValueError(f"Document {document_id} is not indexed")
+        checkpoint = IngestionCheckpoint.start(
+            document_id=document_id,
+            filename=entry["filename"],
+            collection_name=f"{STAGING_PREFIX}{collection_name}",
+            cache_key=entry["cache_key"],
+            target_collection=collection_name,
+        )
+        return self._run_checkpoint(checkpoint)
+
+    @log_execution
+    def resume_pending(self) -> int:
+        """Finish ingestions interrupted by a crash or redeploy"""
+        resumed = 0
+        for checkpoint in IngestionCheckpoint.pending():
+            if not checkpoint.acquire():
+                continue
+            if checkpoint.failures >= settings.ingestion_max_attempts:
+                self._abandon(checkpoint)
+                continue
+            try:
+                self._run_checkpoint(checkpoint)
+                resumed += 1
+            except Exception as e:
+                log_exception(
+                    self.logger, e, f"Error resuming {checkpoint.document_id}"
+                )
+        return resumed
+
+    def _run_checkpoint(self, checkpoint: IngestionCheckpoint) -> int:
+        # only raised errors count towards ingestion_max_attempts, a killed
+        # process leaves the failure count untouched
+        try:
+            return self._ingest(checkpoint)
+        except Exception:
+            checkpoint.record_failure()
+            raise
+        finally:
+            checkpoint.release()
+
+    def _abandon(self, checkpoint: IngestionCheckpoint) -> None:
+        """Drop a document that keeps failing so it is not served half-written"""
+        self.logger.error(
+            f"Giving up on document {checkpoint.document_id} after "
+            f"{checkpoint.failures} failed attempts, removing its collection"
         )
+        state = checkpoint.state
+        chroma_db = ChromaDB()
+        if state.get("target_collection"):
+            # a failed re-index only drops its staging copy, the live one stays;
+            # once the swap has started the staging copy is the live data
+            staging_name = state["collection_name"]
+            swap_started = state["stage"] in ("swapping", "swapped")
+            if not swap_started and chroma_db.has_collection(staging_name):
+                chroma_db.delete_collection(staging_name)
+        else:
+            if chroma_db.has_collection(state["collection_name"]):
+                chroma_db.delete_collection(state["collection_name"])
+            DocumentRoutingIndex().remove(checkpoint.document_id)
+            # without this a later reindex.py run would bring the document back
+            DoclingCache().remove_entry(checkpoint.document_id)
+        checkpoint.remove()
+
+    def _ingest(self, checkpoint: IngestionCheckpoint) -> int:
+        state = checkpoint.state
+        collection_name = state["collection_name"]
+        target_collection = state.get("target_collection")
+        chroma_db = ChromaDB()
+
+        if (
+            target_collection
+            and state["stage"] == "started"
+            and chroma_db.has_collection(collection_name)
+        ):
+            # staging copy left by an earlier re-index, only dropped once the
+            # checkpoint lock guarantees no other worker is building it
+            chroma_db.delete_collection(collection_name)
 
-        pipeline = self._create_pipeline(document_store)
-        result = pipeline.run(
-            {
-                "docling_processor": {
-                    "sources": [file_path],
-                    "document_id": document.id,
-                    "filename": document.metadata.filename,
+        chunks = checkpoint.load_chunks()
+        if chunks is None:
+            result = self._create_chunking_pipeline().run(
+                {
+                    "docling_processor": {
+                        "sources": [state["file_path"]] if state["file_path"] else [],
+                        "cache_keys": (
+                            [state["cache_key"]] if state["cache_key"] else []
+                        ),
+                        "document_id": state["document_id"],
+                        "filename": state["filename"],
+                    }
                 }
-            }
+            )
+            chunks = result["cleaner"]["documents"]
+            if state.get("target_collection") and any(
+                "error" in chunk.meta for chunk in chunks
+            ):
+                raise ValueError(
+                    f"Chunking failed for document {state['document_id']}, "
+                    "keeping the live collection"
+                )
+            checkpoint.save_chunks(chunks)
+        else:
+            self.logger.info(f"Resuming {state['document_id']} from checkpoint")
+
+        if state["stage"] == "swapping" and not chroma_db.has_collection(
+            collection_name
+        ):
+            # the rename completed before a restart, only its record was lost
+            checkpoint.mark_stage("swapped")
+        if state["stage"] == "swapped":
+            collection_name, target_collection = target_collection, None
+        collection = chroma_db.get_collection(collection_name)
+        document_store = ChromaDocumentStore(
+            collection_name=collection_name,
+            persist_path=chroma_db.shard_path(collection_name),
+        )
+        embedder = create_document_embedder()
+        embedder.warm_up()
+        writer = DocumentWriter(document_store=document_store)
+
+        embedded_documents = []
+        for index, start in enumerate(range(0, len(chunks), self.batch_size)):
+            embedded = checkpoint.load_batch(index)
+            if embedded is None:
+                batch = chunks[start : start + self.batch_size]
+                embedded = embedder.run(documents=batch)["documents"]
+                checkpoint.save_batch(index, embedded)
+
+            if not checkpoint.is_written(index):
+                # a crash mid-write leaves part of the batch in the collection
+                present = set(
+                    collection.get(ids=[d.id for d in embedded], include=[])["ids"]
+                )
+                missing = [d for d in embedded if d.id not in present]
+                if missing:
+                    writer.run(documents=missing)
+                checkpoint.mark_written(index)
+
+            embedded_documents.extend(embedded)
+
+        if target_collection:
+            checkpoint.mark_stage("swapping")
+            chroma_db.replace_collection(collection_name, target_collection)
+            checkpoint.mark_stage("swapped")
+        DocumentRoutingIndex().add_documents(embedded_documents)
+        checkpoint.remove()
+
+        chunks_count = len(embedded_documents)
+        self.logger.info(
+            f"Indexed {chunks_count} chunks for document {state['document_id']}"
         )
-        self.logger.info(f"Pipeline result: {result}")
-        chunks_count = result.get("writer", {}).get("documents_written", [])
-        self.logger.info(f"Indexed {chunks_count} chunks for document {document.id}")
         return chunks_count
 
-    def _create_pipeline(self, document_store):
+    def _create_chunking_pipeline(self):
         pipeline = Pipeline()
 
         pipeline.add_component("docling_processor", DoclingProcessor())
         pipeline.add_component("cleaner", DocumentCleaner())
-        pipeline.add_component(
-            "embedder", SentenceTransformersDocumentEmbedder(model=self.embedding_model)
-        )
-        pipeline.add_component("writer", DocumentWriter(document_store=document_store))
 
         pipeline.connect("docling_processor.documents", "cleaner.documents")
-        pipeline.connect("cleaner.documents", "embedder.documents")
-        pipeline.connect("embedder.documents", "writer.documents")
 
         return pipeline
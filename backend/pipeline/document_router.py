@@ -0,0 +1,80 @@
+import numpy as np
+from haystack import Document as HaystackDocument
+
+from core.config import settings
+from core.logger import get_agent_logger
+from database.chroma import ChromaDB
+
+ROUTING_COLLECTION = "document_routing"
+
+
+class DocumentRoutingIndex:
+    """Document-level index of chunk-embedding centroids used to prune searches"""
+
+    def __init__(self):
+        self.collection = ChromaDB().get_collection(
+            ROUTING_COLLECTION, metadata={"hnsw:space": "cosine"}
+        )
+        self.logger = get_agent_logger("DocumentRoutingIndex")
+
+    def add(
+        self,
+        document_id: str,
+        filename: str,
+        embeddings: list[list[float]],
+        headings: list[str],
+    ) -> None:
+        if not embeddings:
+            return
+        centroid = np.mean(np.asarray(embeddings, dtype=np.float32), axis=0)
+        self.collection.upsert(
+            ids=[document_id],
+            embeddings=[centroid.tolist()],
+            documents=[" ".join(dict.fromkeys(h for h in headings if h))],
+            metadatas=[{"document_id": document_id, "filename": filename}],
+        )
+
+    def add_documents(self, documents: list[HaystackDocument]) -> None:
+        """Index embedded chunks, grouped by the document they belong to"""
+        by_document: dict[str, list[HaystackDocument]] = {}
+        for doc in documents:
+            if doc.embedding is not None and "error" not in doc.meta:
+                by_document.setdefault(doc.meta["document_id"], []).append(doc)
+
+        for document_id, docs in by_document.items():
+            self.add(
+                document_id=document_id,
+                filename=docs[0].meta.get("filename", ""),
+                embeddings=[doc.embedding for doc in docs],
+                headings=[doc.meta.get("headings", "") for doc in docs],
+            )
+        self.logger.info(f"Added {len(by_document)} documents to the routing index")
+
+    def remove(self, document_id: str) -> None:
+        self.collection.delete(ids=[document_id])
+
+    def route(
+        self,
+        query_embedding: list[float],
+        document_ids: list[str],
+        top_m: int | None = None,
+    ) -> list[str]:
+        """Return the subset of document_ids worth searching at chunk level"""
+        top_m = settings.routing_top_m if top_m is None else top_m
+        if top_m <= 0 or len(document_ids) <= top_m:
+            return document_ids
+
+        indexed = set(self.collection.get(ids=document_ids, include=[])["ids"])
+        # documents ingested before the routing index existed are always searched
+        unindexed = [doc_id for doc_id in document_ids if doc_id not in indexed]
+        if not indexed:
+            return document_ids
+
+        result = self.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=min(top_m, len(indexed)),
+            where={"document_id": {"$in": sorted(indexed)}},
+            include=[],
+        )
+        selected = set(result["ids"][0]) | set(unindexed)
+        return [doc_id for doc_id in document_ids if doc_id in selected]
@@ -0,0 +1,34 @@
+from typing import Any
+
+from haystack.components.embedders import (
+    SentenceTransformersDocumentEmbedder,
+    SentenceTransformersTextEmbedder,
+)
+
+from core.config import settings
+
+
+def _embedder_kwargs(backend: str | None = None) -> dict[str, Any]:
+    backend = backend or settings.embedding_backend
+    if backend == "torch":
+        return {"model": settings.embedding_model, "backend": "torch"}
+
+    kwargs: dict[str, Any] = {
+        "model": settings.embedding_model_path or settings.embedding_model,
+        "backend": backend,
+    }
+    if settings.embedding_model_file:
+        kwargs["model_kwargs"] = {"file_name": settings.embedding_model_file}
+    return kwargs
+
+
+def create_document_embedder(
+    backend: str | None = None,
+) -> SentenceTransformersDocumentEmbedder:
+    return SentenceTransformersDocumentEmbedder(**_embedder_kwargs(backend))
+
+
+def create_text_embedder(
+    backend: str | None = None,
+) -> SentenceTransformersTextEmbedder:
+    return SentenceTransformersTextEmbedder(**_embedder_kwargs(backend))
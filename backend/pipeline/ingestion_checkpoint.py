@@ -0,0 +1,176 @@
+import fcntl
+import gzip
+import json
+import os
+import shutil
+
+from haystack import Document as HaystackDocument
+
+from core.config import settings
+from core.logger import get_agent_logger
+
+logger = get_agent_logger("IngestionCheckpoint")
+
+STATE_FILE = "state.json"
+LOCK_FILE = ".lock"
+
+
+def _write_json(path: str, data, compress: bool = False) -> None:
+    tmp_path = f"{path}.tmp"
+    opener = gzip.open if compress else open
+    with opener(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str, compress: bool = False):
+    opener = gzip.open if compress else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class IngestionCheckpoint:
+    """Per-document ingestion progress: chunks, embedded batches and written batches
+
+    A checkpoint is only read or written while its lock is held, so concurrent
+    workers sharing checkpoint_dir never ingest the same document twice.
+    """
+
+    def __init__(self, directory: str, state: dict | None = None):
+        self.directory = directory
+        self.state = state or {}
+        self._lock_fd: int | None = None
+
+    @classmethod
+    def start(
+        cls,
+        document_id: str,
+        filename: str,
+        collection_name: str,
+        file_path: str | None = None,
+        cache_key: str | None = None,
+        target_collection: str | None = None,
+    ) -> "IngestionCheckpoint":
+        """Create a locked checkpoint, replacing any stale one for the document"""
+        directory = os.path.join(settings.checkpoint_dir, document_id)
+        os.makedirs(directory, exist_ok=True)
+        checkpoint = cls(directory)
+        if not checkpoint._lock():
+            raise ValueError(f"Document {document_id} is already being ingested")
+
+        for name in os.listdir(directory):
+            if name != LOCK_FILE:
+                os.remove(os.path.join(directory, name))
+        checkpoint.state = {
+            "document_id": document_id,
+            "filename": filename,
+            "collection_name": collection_name,
+            "file_path": file_path,
+            "cache_key": cache_key,
+            "target_collection": target_collection,
+            "stage": "started",
+            "failures": 0,
+            "written_batches": [],
+        }
+        checkpoint._save_state()
+        return checkpoint
+
+    @classmethod
+    def pending(cls) -> list["IngestionCheckpoint"]:
+        """Unlocked checkpoints left behind; acquire() each before resuming it"""
+        if not os.path.isdir(settings.checkpoint_dir):
+            return []
+        return [
+            cls(os.path.join(settings.checkpoint_dir, name))
+            for name in sorted(os.listdir(settings.checkpoint_dir))
+        ]
+
+    def _lock(self) -> bool:
+        try:
+            fd = os.open(
+                os.path.join(self.directory, LOCK_FILE), os.O_CREAT | os.O_RDWR
+            )
+        except OSError:
+            # the directory was removed by a worker that completed it
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def acquire(self) -> bool:
+        """Lock the checkpoint and load its state, False if held or already gone"""
+        if not self._lock():
+            return False
+        try:
+            self.state = _read_json(os.path.join(self.directory, STATE_FILE))
+        except FileNotFoundError:
+            # completed by another worker, or still being created by start()
+            self.release()
+            return False
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable checkpoint {self.directory}: {e}")
+            self.release()
+            return False
+        return True
+
+    def release(self) -> None:
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    @property
+    def document_id(self) -> str:
+        return self.state["document_id"]
+
+    @property
+    def failures(self) -> int:
+        return self.state["failures"]
+
+    def _save_state(self) -> None:
+        _write_json(os.path.join(self.directory, STATE_FILE), self.state)
+
+    def mark_stage(self, stage: str) -> None:
+        self.state["stage"] = stage
+        self._save_state()
+
+    def record_failure(self) -> None:
+        self.state["failures"] += 1
+        self._save_state()
+
+    def load_chunks(self) -> list[HaystackDocument] | None:
+        path = os.path.join(self.directory, "chunks.json.gz")
+        if self.state["stage"] == "started" or not os.path.exists(path):
+            return None
+        return [HaystackDocument.from_dict(d) for d in _read_json(path, True)]
+
+    def save_chunks(self, chunks: list[HaystackDocument]) -> None:
+        path = os.path.join(self.directory, "chunks.json.gz")
+        _write_json(path, [d.to_dict(flatten=False) for d in chunks], True)
+        self.state["stage"] = "chunked"
+        self._save_state()
+
+    def load_batch(self, index: int) -> list[HaystackDocument] | None:
+        path = os.path.join(self.directory, f"embedded_{index}.json.gz")
+        if not os.path.exists(path):
+            return None
+        return [HaystackDocument.from_dict(d) for d in _read_json(path, True)]
+
+    def save_batch(self, index: int, documents: list[HaystackDocument]) -> None:
+        path = os.path.join(self.directory, f"embedded_{index}.json.gz")
+        _write_json(path, [d.to_dict(flatten=False) for d in documents], True)
+
+    def is_written(self, index: int) -> bool:
+        return index in self.state["written_batches"]
+
+    def mark_written(self, index: int) -> None:
+        self.state["written_batches"].append(index)
+        self._save_state()
+
+    def remove(self) -> None:
+        """Delete the checkpoint and release its lock"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.release()
@@ -1,11 +1,16 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import openai
 from haystack import Document, Pipeline, component
-from haystack.components.embedders import SentenceTransformersTextEmbedder
 from haystack_integrations.components.retrievers.chroma import ChromaEmbeddingRetriever
 from haystack_integrations.document_stores.chroma import ChromaDocumentStore
 
 from core.config import settings
 from core.logger import get_agent_logger, log_execution
+from database.chroma import ChromaDB
+from pipeline.document_router import DocumentRoutingIndex
+from pipeline.embedders import create_text_embedder
+from query.models import DocumentReference
 
 
 @component
@@ -22,7 +27,12 @@ class OpenAIGenerator:
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": "You are a helpful assistant that answers questions based on the provided context. if inefficient or irrelevant use your own knowledge. but if you don't know the answer, say 'I don't know based on the provided information.'"},
+                    {
+                        "role": "system",
+                        "content": (
+                            "You are a helpful assistant that answers questions based on the provided context. if inefficient or irrelevant use your own knowledge. but if you don't know the answer, say 'I don't know based on the provided information.'"
+                        ),
+                    },
                     {"role": "user", "content": prompt},
                 ],
                 temperature=0.7,
@@ -41,6 +51,7 @@ class OpenAIGenerator:
 class PromptBuilder:
     def __init__(self):
         self.logger = get_agent_logger("PromptBuilder")
+
     @component.output_types(prompt=str)
     @log_execution
     def run(self, documents: list[Document], query: str):
@@ -49,7 +60,11 @@ class PromptBuilder:
             for i, doc in enumerate(documents)
             if doc.content.strip()
         ]
-        context = "\n\n".join(context_blocks) if context_blocks else "No relevant context available."
+        context = (
+            "\n\n".join(context_blocks)
+            if context_blocks
+            else "No relevant context available."
+        )
 
         prompt = (
             f"The following are excerpts from documents:\n\n"
@@ -62,7 +77,6 @@ class PromptBuilder:
         return {"prompt": prompt}
 
 
-
 class QueryProcessor:
     def __init__(self):
         self.logger = get_agent_logger("QueryProcessor")
@@ -70,13 +84,10 @@ class QueryProcessor:
     def _build_pipeline(self, collection: str) -> Pipeline:
         doc_store = ChromaDocumentStore(
             collection_name=collection,
-            persist_path=settings.chroma_persist_directory,
+            persist_path=ChromaDB().shard_path(collection),
         )
 
         pipeline = Pipeline()
-        pipeline.add_component(
-            "embedder", SentenceTransformersTextEmbedder(model=settings.embedding_model)
-        )
         pipeline.add_component(
             "retriever", ChromaEmbeddingRetriever(document_store=doc_store)
         )
@@ -88,75 +99,103 @@ class QueryProcessor:
             ),
         )
 
-        pipeline.connect("embedder.embedding", "retriever.query_embedding")
         pipeline.connect("retriever.documents", "prompt.documents")
         pipeline.connect("prompt.prompt", "llm.prompt")
         pipeline.connect("retriever.documents", "llm.documents")
 
         return pipeline
 
+    def embed_query(self, query: str) -> list[float]:
+        embedder = create_text_embedder()
+        embedder.warm_up()
+        return embedder.run(text=query)["embedding"]
+
+    def route_documents(
+        self, query_embedding: list[float], document_ids: list[str]
+    ) -> list[str]:
+        """Prune document_ids to the top routing_top_m by document-level similarity"""
+        routed = DocumentRoutingIndex().route(query_embedding, document_ids)
+        self.logger.info(
+            f"Routing skipped {len(document_ids) - len(routed)} of "
+            f"{len(document_ids)} collections"
+        )
+        return routed
+
     @log_execution
     def process_query(
-        self, query: str, document_ids: list[str] | None = None, top_k: int = 3
+        self,
+        query: str,
+        document_ids: list[str] | None = None,
+        top_k: int = 3,
+        query_embedding: list[float] | None = None,
     ):
         if not document_ids:
             raise ValueError("No document IDs provided.")
 
-        results = []
-
-        for doc_id in document_ids:
-            try:
-                pipeline = self._build_pipeline(f"doc_{doc_id}")
-                output = pipeline.run(
-                    {
-                        "embedder": {"text": query},
-                        "retriever": {"top_k": top_k},
-                        "prompt": {"query": query},
-                    }
+        # embedded once and shared by every collection searched
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
+
+        # collections live on independent shards, so fan out and gather in order
+        max_workers = max(1, min(len(document_ids), settings.query_max_workers))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(
+                executor.map(
+                    lambda doc_id: self._query_document(
+                        query, query_embedding, doc_id, top_k
+                    ),
+                    document_ids,
                 )
+            )
 
-                llm_output = output.get("llm", {})
-                docs = llm_output.get(
-                    "documents", output.get("retriever", {}).get("documents", [])
-                )
+    def _query_document(
+        self, query: str, query_embedding: list[float], doc_id: str, top_k: int
+    ) -> dict:
+        try:
+            pipeline = self._build_pipeline(f"doc_{doc_id}")
+            output = pipeline.run(
+                {
+                    "retriever": {"query_embedding": query_embedding, "top_k": top_k},
+                    "prompt": {"query": query},
+                }
+            )
 
-                for d in docs:
-                    self.logger.info(d.meta)
+            llm_output = output.get("llm", {})
+            docs = llm_output.get(
+                "documents", output.get("retriever", {}).get("documents", [])
+            )
 
-                formatted_docs = [
-                    {
-                        "content": d.content,
-                        "document_id": d.meta.get("document_id", "unknown"),
-                        "filename": d.meta.get("filename", "unknown"),
-                        "chunk_id": d.meta.get("chunk_id", "unknown"),
-                        "page_num": d.meta.get("page_nums", None),
-                        "headings": d.meta.get("headings", None),
-                        "score": getattr(d, "score", 0.0),
-                    }
-                    for d in docs
-                    if hasattr(d, "content")
-                ]
-
-                self.logger.info(
-                    f"Processed query for document {doc_id} with {len(formatted_docs)} retrieved chunks"
+            for d in docs:
+                self.logger.info(d.meta)
+
+            formatted_docs = [
+                DocumentReference(
+                    content=d.content,
+                    document_id=d.meta.get("document_id", "unknown"),
+                    filename=d.meta.get("filename", "unknown"),
+                    chunk_id=d.meta.get("chunk_id", "unknown"),
+                    page_num=d.meta.get("page_nums", None),
+                    headings=d.meta.get("headings", None),
+                    score=getattr(d, "score", None) or 0.0,
                 )
+                for d in docs
+                if hasattr(d, "content")
+            ]
 
-                results.append(
-                    {
-                        "document_id": doc_id,
-                        "answer": llm_output.get("generated_text", "No answer."),
-                        "documents": formatted_docs,
-                    }
-                )
+            self.logger.info(
+                f"Processed query for document {doc_id} with {len(formatted_docs)} retrieved chunks"
+            )
 
-            except Exception as e:
-                self.logger.error(f"Error for doc {doc_id}: {str(e)}")
-                results.append(
-                    {
-                        "document_id": doc_id,
-                        "answer": f"Error: {str(e)}",
-                        "documents": [],
-                    }
-                )
+            return {
+                "document_id": doc_id,
+                "answer": llm_output.get("generated_text", "No answer."),
+                "documents": formatted_docs,
+            }
 
-        return results
+        except Exception as e:
+            self.logger.error(f"Error for doc {doc_id}: {str(e)}")
+            return {
+                "document_id": doc_id,
+                "answer": f"Error: {str(e)}",
+                "documents": [],
+            }
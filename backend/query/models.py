@@ -1,14 +1,61 @@
-from typing import Any
+from typing import Literal
 
 from pydantic import BaseModel, Field
 
+ReferenceField = Literal[
+    "content", "document_id", "filename", "chunk_id", "page_num", "headings", "score"
+]
+
+
+class DocumentReference(BaseModel):
+    document_id: str
+    filename: str
+    chunk_id: str
+    page_num: str | None = None
+    headings: str | None = None
+    score: float = 0.0
+    content: str | None = None
+
 
 class Query(BaseModel):
     query: str
-    document_ids: list[str] | None = None 
-    top_k: int = Field(default=3, ge=1, le=10) 
+    document_ids: list[str] | None = None
+    top_k: int = Field(default=3, ge=1, le=10)
+    fields: list[ReferenceField] | None = None
+    include_content: bool = True
+
+    def reference_fields(self) -> set[str]:
+        """Fields of each DocumentReference to return in the response"""
+        if self.fields is None:
+            fields = set(DocumentReference.model_fields)
+        else:
+            fields = set(self.fields)
+        if not self.include_content:
+            fields.discard("content")
+        return fields
 
 
 class QueryResponse(BaseModel):
     answer: str
-    documents: list[dict[str, Any]] 
+    documents: list[DocumentReference]
+    collections_searched: int = 0
+    collections_skipped: int = 0
+
+
+class SelectedDocumentReference(BaseModel):
+    """DocumentReference as serialized, only the fields the query selected"""
+
+    document_id: str | None = None
+    filename: str | None = None
+    chunk_id: str | None = None
+    page_num: str | None = None
+    headings: str | None = None
+    score: float | None = None
+    content: str | None = None
+
+
+class SelectedQueryResponse(BaseModel):
+    answer: str
+    documents: list[SelectedDocumentReference]
+    collections_searched: int = 0
+    collections_skipped: int = 0
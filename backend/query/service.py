@@ -18,12 +18,28 @@ class QueryService:
                 if not document:
                     raise ValueError(f"Document with ID {doc_id} not found")
 
+        document_ids = query.document_ids
+        query_embedding = None
+        if document_ids:
+            query_embedding = self.processor.embed_query(query.query)
+            document_ids = self.processor.route_documents(query_embedding, document_ids)
+
         results = self.processor.process_query(
-            query=query.query, document_ids=query.document_ids, top_k=query.top_k
+            query=query.query,
+            document_ids=document_ids,
+            top_k=query.top_k,
+            query_embedding=query_embedding,
         )
+        collections_searched = len(document_ids or [])
+        collections_skipped = len(query.document_ids or []) - collections_searched
 
         if not results:
-            return QueryResponse(answer="No results found", documents=[])
+            return QueryResponse(
+                answer="No results found",
+                documents=[],
+                collections_searched=collections_searched,
+                collections_skipped=collections_skipped,
+            )
 
         combined_answer = results[0]["answer"]
 
@@ -31,6 +47,11 @@ class QueryService:
         for result in results:
             documents.extend(result.get("documents", []))
 
-        documents.sort(key=lambda x: x.get("score", 0), reverse=True)
+        documents.sort(key=lambda x: x.score, reverse=True)
 
-        return QueryResponse(answer=combined_answer, documents=documents)
+        return QueryResponse(
+            answer=combined_answer,
+            documents=documents,
+            collections_searched=collections_searched,
+            collections_skipped=collections_skipped,
+        )
@@ -0,0 +1,34 @@
+import argparse
+
+from core.config import settings
+from core.logger import get_agent_logger, setup_logging
+from database.chroma import ChromaDB
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Move Chroma collections onto the shard they are routed to"
+    )
+    parser.add_argument(
+        "--from",
+        dest="source_paths",
+        nargs="+",
+        default=[],
+        metavar="DIR",
+        help="Previous shard directories to drain, in addition to "
+        "CHROMA_PERSIST_DIRECTORY",
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+    logger = get_agent_logger("rebalance")
+
+    chroma_db = ChromaDB()
+    source_paths = [settings.chroma_persist_directory, *args.source_paths]
+    logger.info(f"Rebalancing across {len(chroma_db.shard_paths)} shards")
+    moved = chroma_db.rebalance(source_paths)
+    logger.info(f"Moved {moved} collections")
+
+
+if __name__ == "__main__":
+    main()
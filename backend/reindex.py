@@ -0,0 +1,50 @@
+import argparse
+import sys
+
+from core.logger import get_agent_logger, setup_logging
+from database.chroma import ChromaDB
+from pipeline.docling_cache import DoclingCache
+from pipeline.document_processor import DocumentProcessor
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Re-chunk and re-embed documents from cached Docling conversions"
+    )
+    parser.add_argument(
+        "document_ids",
+        nargs="*",
+        help="Documents to re-index (defaults to every cached document)",
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+    logger = get_agent_logger("reindex")
+
+    # manifests of documents that were deleted or abandoned are skipped
+    chroma_db = ChromaDB()
+    document_ids = args.document_ids or [
+        entry["document_id"]
+        for entry in DoclingCache().get_entries()
+        if chroma_db.has_collection(f"doc_{entry['document_id']}")
+    ]
+    processor = DocumentProcessor()
+
+    failed = 0
+    for document_id in document_ids:
+        try:
+            chunks_count = processor.reindex_document(document_id)
+            logger.info(f"{document_id}: {chunks_count} chunks")
+        except Exception as e:
+            failed += 1
+            logger.error(f"{document_id}: {e}")
+
+    logger.info(
+        f"Re-indexed {len(document_ids) - failed}/{len(document_ids)} documents"
+    )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 
 from core.logger import log_execution
-from query.models import Query, QueryResponse
+from query.models import Query, SelectedQueryResponse
 from query.service import QueryService
 
 router = APIRouter(prefix="/query", tags=["query"])
@@ -9,11 +10,23 @@ router = APIRouter(prefix="/query", tags=["query"])
 query_service_dependency = Depends(lambda: QueryService())
 
 
-@router.post("/", response_model=QueryResponse)
+# the route returns a prepared ORJSONResponse, the model only documents its shape
+@router.post("/", response_model=SelectedQueryResponse)
 @log_execution
 def process_query(query: Query, query_service: QueryService = query_service_dependency):
     try:
-        return query_service.process_query(query)
+        response = query_service.process_query(query)
+        # serialize directly so FastAPI does not re-validate the response model
+        return ORJSONResponse(
+            content=response.model_dump(
+                include={
+                    "answer": True,
+                    "documents": {"__all__": query.reference_fields()},
+                    "collections_searched": True,
+                    "collections_skipped": True,
+                }
+            )
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e)) from e
     except Exception as e: